@@ -2,8 +2,9 @@
 Control-flow graph, execution path, and symbolic execution tree generator.
 """
 import math
+import os
 
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
 
 import svgwrite
 from svgwrite import Drawing
@@ -12,6 +13,9 @@ import numpy as np
 
 FONT: str = "CMU Serif"
 
+# Half-width of the arrowhead created by `create_v` plus the stroke width.
+ARROW_PADDING: float = 3.0 + 0.5
+
 
 def rotation_matrix(angle) -> np.array:
     """
@@ -44,6 +48,20 @@ class CFGElement:
         """
         pass
 
+    def bounds(self) -> Optional[Tuple[np.array, np.array]]:
+        """
+        Get bounding box of the element in real positions as minimum and
+        maximum points.  `None` means that the element may be anywhere.
+        """
+        return None
+
+    def simplified(self) -> Optional["CFGElement"]:
+        """
+        Get the element for coarse level of detail or `None` if it should
+        not be drawn.
+        """
+        return self
+
 
 class Node(CFGElement):
     """
@@ -51,7 +69,8 @@ class Node(CFGElement):
     """
     def __init__(
             self, point: np.array, name: str = "s", index: str = "",
-            is_terminal: bool = False, is_feasible: bool = True):
+            is_terminal: bool = False, is_feasible: bool = True,
+            is_labeled: bool = True):
 
         super().__init__()
         self.point: np.array = point
@@ -59,6 +78,7 @@ class Node(CFGElement):
         self.index: str = index
         self.is_terminal: bool = is_terminal
         self.is_feasible: bool = is_feasible
+        self.is_labeled: bool = is_labeled
 
     def add(self, svg: Drawing) -> None:
         circle = svg.circle(
@@ -76,6 +96,9 @@ class Node(CFGElement):
                 circle.update({"stroke-dasharray": "1,1"})
             svg.add(circle)
 
+        if not self.is_labeled:
+            return
+
         text_wrap = svg.text(
             "", np.array((0, 2)) + to_grid(self.point), font_size="10px",
             font_family=FONT, text_anchor="middle")
@@ -85,6 +108,22 @@ class Node(CFGElement):
 
         svg.add(text_wrap)
 
+    def bounds(self) -> Optional[Tuple[np.array, np.array]]:
+        point: np.array = to_grid(self.point)
+        offset: np.array = np.array((self.radius, self.radius))
+        if self.is_labeled:
+            # Approximate label width for 10px font and 65% subscript.
+            width: float = (len(self.name) + 0.65 * len(self.index)) * 3.0
+            offset[0] = max(offset[0], width)
+        return point - offset, point + offset
+
+    def simplified(self) -> Optional[CFGElement]:
+        node: Node = Node(
+            self.point, self.name, self.index, self.is_terminal,
+            self.is_feasible, is_labeled=False)
+        node.radius = self.radius
+        return node
+
 
 class Text(CFGElement):
     def __init__(self, text: svgwrite.text.Text):
@@ -96,6 +135,19 @@ class Text(CFGElement):
     def add(self, svg: Drawing) -> None:
         svg.add(self.text)
 
+    def bounds(self) -> Optional[Tuple[np.array, np.array]]:
+        # Approximate text extent for 10px font.
+        length: int = len(self.text.text or "") + sum(
+            len(x.text or "") for x in self.text.elements)
+        point: np.array = np.array(
+            (float(self.text["x"]), float(self.text["y"])))
+        return (
+            point - np.array((length * 3.0, 10.0)),
+            point + np.array((length * 3.0, 3.0)))
+
+    def simplified(self) -> Optional[CFGElement]:
+        return None
+
 
 class Loop(CFGElement):
     def __init__(self, point: np.array, angle: float):
@@ -123,6 +175,10 @@ class Loop(CFGElement):
             d=create_v(p4, n, np.dot(rotation_matrix(-math.pi / 2.0), n)),
             stroke_width=0.5, fill="none", stroke="black"))
 
+    def bounds(self) -> Optional[Tuple[np.array, np.array]]:
+        point: np.array = to_grid(self.point)
+        return point - 20, point + 20
+
 
 def create_v(point: np.array, n: np.array, m: np.array) -> list:
     return [
@@ -161,6 +217,51 @@ class Arrow(CFGElement):
             v.update({"stroke-dasharray": "1,1"})
         svg.add(v)
 
+    def bounds(self) -> Optional[Tuple[np.array, np.array]]:
+        a: np.array = to_grid(self.point1)
+        b: np.array = to_grid(self.point2)
+        return (
+            np.minimum(a, b) - ARROW_PADDING,
+            np.maximum(a, b) + ARROW_PADDING)
+
+
+class Segment(CFGElement):
+    """
+    Chain of arrows drawn as one polyline without intermediate nodes.
+    """
+    def __init__(self, points: List[np.array], is_feasible: bool = True):
+        super().__init__()
+        assert len(points) >= 2
+        self.points: List[np.array] = points
+        self.is_feasible: bool = is_feasible
+
+    def add(self, svg: Drawing) -> None:
+        points: List[np.array] = [to_grid(x) for x in self.points]
+        n1 = (points[1] - points[0]) / np.linalg.norm(points[1] - points[0])
+        n2 = (points[-1] - points[-2]) / np.linalg.norm(
+            points[-1] - points[-2])
+        points[0] = points[0] + n1 * self.radius
+        points[-1] = points[-1] - n2 * self.radius
+        line = svg.polyline(
+            points, stroke_width=0.5, fill="none", stroke="black")
+        if not self.is_feasible:
+            line.update({"stroke-dasharray": "1,1"})
+        svg.add(line)
+
+        v = svg.path(
+            d=create_v(
+                points[-1], n2, np.dot(rotation_matrix(-math.pi / 2.0), n2)),
+            stroke_width=0.5, fill="none", stroke="black")
+        if not self.is_feasible:
+            v.update({"stroke-dasharray": "1,1"})
+        svg.add(v)
+
+    def bounds(self) -> Optional[Tuple[np.array, np.array]]:
+        points: np.array = np.array([to_grid(x) for x in self.points])
+        return (
+            points.min(axis=0) - ARROW_PADDING,
+            points.max(axis=0) + ARROW_PADDING)
+
 
 class Ellipsis(CFGElement):
     def __init__(self, point: np.array, n: np.array):
@@ -174,6 +275,55 @@ class Ellipsis(CFGElement):
                 to_grid(self.point) + self.n * i, 0.6,
                 stroke="none", fill="black"))
 
+    def bounds(self) -> Optional[Tuple[np.array, np.array]]:
+        point: np.array = to_grid(self.point)
+        offset: np.array = np.abs(self.n) * 4 + 0.6
+        return point - offset, point + offset
+
+
+class GridIndex:
+    """
+    Spatial index of element bounding boxes over a uniform grid.
+    """
+    def __init__(self, cell_size: float):
+        self.cell_size: float = cell_size
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        self.bounds: Dict[int, Optional[Tuple[np.array, np.array]]] = {}
+        # Elements without bounding box.
+        self.unbounded: List[int] = []
+
+    def get_cells(self, min_: np.array, max_: np.array):
+        """
+        Iterate over cells intersecting the box.
+        """
+        x1, y1 = np.floor(min_ / self.cell_size).astype(int)
+        x2, y2 = np.floor(max_ / self.cell_size).astype(int)
+        for x in range(x1, x2 + 1):
+            for y in range(y1, y2 + 1):
+                yield x, y
+
+    def insert(
+            self, index: int,
+            bounds: Optional[Tuple[np.array, np.array]]) -> None:
+        self.bounds[index] = bounds
+        if bounds is None:
+            self.unbounded.append(index)
+            return
+        for cell in self.get_cells(*bounds):
+            self.cells.setdefault(cell, []).append(index)
+
+    def query(self, min_: np.array, max_: np.array) -> List[int]:
+        """
+        Get sorted indices of elements intersecting the box.  Elements
+        without bounding box intersect any box.
+        """
+        result: Set[int] = set(self.unbounded)
+        for cell in self.get_cells(min_, max_):
+            result.update(
+                x for x in self.cells.get(cell, [])
+                if is_intersecting(self.bounds[x], min_, max_))
+        return sorted(result)
+
 
 class CFGRepresentation:
     def __init__(self, radius: float = 7.5):
@@ -212,6 +362,195 @@ class CFGRepresentation:
         for element in self.elements:  # type: CFGElement
             element.add(drawing)
 
+    def simplify(self) -> "CFGRepresentation":
+        """
+        Get representation for coarse level of detail: without labels and
+        with chains of arrows (like ones created by `add_chain`) collapsed
+        into single segments.
+        """
+        def key(point: np.array) -> Tuple[float, float]:
+            return float(point[0]), float(point[1])
+
+        arrows: List[Arrow] = [
+            x for x in self.elements if isinstance(x, Arrow)]
+        outgoing: Dict[Tuple[float, float], List[Arrow]] = {}
+        incoming: Dict[Tuple[float, float], List[Arrow]] = {}
+        for arrow in arrows:
+            outgoing.setdefault(key(arrow.point1), []).append(arrow)
+            incoming.setdefault(key(arrow.point2), []).append(arrow)
+
+        # Points that cannot be removed from the chain.
+        kept: Set[Tuple[float, float]] = set()
+        for element in self.elements:
+            if isinstance(element, Node) and element.is_terminal:
+                kept.add(key(element.point))
+            elif isinstance(element, (Loop, Ellipsis)):
+                kept.add(key(element.point))
+
+        def is_intermediate(point: Tuple[float, float]) -> bool:
+            return (
+                point not in kept
+                and len(incoming.get(point, [])) == 1
+                and len(outgoing.get(point, [])) == 1
+                and incoming[point][0].is_feasible
+                == outgoing[point][0].is_feasible)
+
+        chains: Dict[int, Segment] = {}
+        collapsed: Set[int] = set()
+        for arrow in arrows:
+            if is_intermediate(key(arrow.point1)):
+                continue
+            points: List[np.array] = [arrow.point1, arrow.point2]
+            current: Arrow = arrow
+            while is_intermediate(key(current.point2)):
+                current = outgoing[key(current.point2)][0]
+                collapsed.add(id(current))
+                if is_collinear(points[-2], points[-1], current.point2):
+                    points[-1] = current.point2
+                else:
+                    points.append(current.point2)
+            if current is not arrow:
+                chains[id(arrow)] = Segment(points, arrow.is_feasible)
+                collapsed.add(id(arrow))
+
+        removed: Set[Tuple[float, float]] = {
+            x for x in incoming if is_intermediate(x)
+            and id(incoming[x][0]) in collapsed}
+
+        result: CFGRepresentation = CFGRepresentation(self.radius)
+        for element in self.elements:
+            if id(element) in chains:
+                result.add(chains[id(element)])
+                continue
+            if id(element) in collapsed:
+                continue
+            if isinstance(element, Node) and key(element.point) in removed:
+                continue
+            simplified: Optional[CFGElement] = element.simplified()
+            if simplified:
+                result.add(simplified)
+        return result
+
+    def draw_tiles(
+            self, directory_name: str, size: np.array,
+            tile_size: float = 250.0, levels: int = 3,
+            detail_scale: float = 1.0, min_node_size: float = 1.0,
+            aggregate_size: float = 4.0) -> List[str]:
+        """
+        Draw the representation as a pyramid of square SVG tiles.
+
+        Level `z` covers the drawing of `size` with tiles of `tile_size`
+        pixels, each tile covering `max(size) / 2^z` of the drawing.  Only
+        elements intersecting the tile are written.  Levels with scale less
+        than `detail_scale` are drawn simplified (see `simplify`).  Levels
+        where node diameter is less than `min_node_size` pixels are drawn
+        aggregated: every cell of `aggregate_size` pixels with elements is
+        one square with opacity showing the number of elements.
+
+        :return: names of created files `<directory>/<z>/<x>_<y>.svg`, empty
+            tiles are not created
+        """
+        file_names: List[str] = []
+        extent: float = float(max(size))
+        cell_size: float = extent / 2 ** (levels - 1)
+        indices: Dict[bool, Tuple[CFGRepresentation, GridIndex]] = {}
+
+        for level in range(levels):
+            tile_extent: float = extent / 2 ** level
+            scale: float = tile_size / tile_extent
+            is_detailed: bool = scale >= detail_scale
+            is_aggregated: bool = 2 * self.radius * scale < min_node_size
+            if is_detailed not in indices:
+                representation: CFGRepresentation = (
+                    self if is_detailed else self.simplify())
+                index: GridIndex = GridIndex(cell_size)
+                for number, element in enumerate(representation.elements):
+                    index.insert(number, element.bounds())
+                indices[is_detailed] = representation, index
+            representation, index = indices[is_detailed]
+
+            os.makedirs(
+                os.path.join(directory_name, str(level)), exist_ok=True)
+            for x in range(math.ceil(size[0] / tile_extent)):
+                for y in range(math.ceil(size[1] / tile_extent)):
+                    min_: np.array = np.array((x, y)) * tile_extent
+                    max_: np.array = min_ + tile_extent
+                    numbers: List[int] = index.query(min_, max_)
+                    if not numbers:
+                        continue
+                    svg: Drawing = Drawing(
+                        size=[str(tile_size)] * 2,
+                        viewBox=f"{min_[0]} {min_[1]} "
+                        f"{tile_extent} {tile_extent}")
+                    if is_aggregated:
+                        add_aggregate(
+                            svg, [index.bounds[i] for i in numbers], min_,
+                            tile_extent, math.ceil(tile_size / aggregate_size))
+                    else:
+                        for number in numbers:
+                            representation.elements[number].add(svg)
+                    file_name: str = os.path.join(
+                        directory_name, str(level), f"{x}_{y}.svg")
+                    with open(file_name, "w+") as output_file:
+                        svg.write(output_file)
+                    file_names.append(file_name)
+
+        return file_names
+
+
+def add_aggregate(
+        svg: Drawing, boxes: List[Optional[Tuple[np.array, np.array]]],
+        min_: np.array, extent: float, count: int) -> None:
+    """
+    Draw elements of the tile as squares of `count` × `count` grid, one for
+    every cell with elements, darker for more elements.
+
+    :param boxes: bounding boxes of elements intersecting the tile
+    :param min_: minimum point of the tile
+    :param extent: size of the tile
+    """
+    step: float = extent / count
+    numbers: Dict[Tuple[int, int], int] = {}
+    for box in boxes:
+        if box is None:
+            continue
+        x1, y1 = np.clip(
+            np.floor((box[0] - min_) / step).astype(int), 0, count - 1)
+        x2, y2 = np.clip(
+            np.floor((box[1] - min_) / step).astype(int), 0, count - 1)
+        for x in range(x1, x2 + 1):
+            for y in range(y1, y2 + 1):
+                numbers[(x, y)] = numbers.get((x, y), 0) + 1
+
+    if not numbers:
+        return
+    maximum: int = max(numbers.values())
+    for (x, y), number in sorted(numbers.items()):
+        svg.add(svg.rect(
+            min_ + np.array((x, y)) * step, (step, step), stroke="none",
+            fill="black", fill_opacity=round(0.2 + 0.8 * number / maximum, 2)))
+
+
+def is_collinear(point1: np.array, point2: np.array, point3: np.array) -> bool:
+    """
+    Check whether the third point continues the direction from the first
+    point to the second one.
+    """
+    a: np.array = point2 - point1
+    b: np.array = point3 - point2
+    return a[0] * b[1] - a[1] * b[0] == 0 and np.dot(a, b) > 0
+
+
+def is_intersecting(
+        bounds: Optional[Tuple[np.array, np.array]], min_: np.array,
+        max_: np.array) -> bool:
+    """
+    Check whether the bounding box intersects the box.
+    """
+    if bounds is None:
+        return True
+    return bool(np.all(bounds[0] <= max_) and np.all(bounds[1] >= min_))
+
 
 class Vertex:
     def __init__(self, id_: str, point: np.array, is_terminal: bool = False):
@@ -225,9 +564,11 @@ class Vertex:
 
 
 class Edge:
-    def __init__(self, vertex_id_1, vertex_id_2):
+    def __init__(
+            self, vertex_id_1, vertex_id_2, condition: Optional[str] = None):
         self.vertex_id_1 = vertex_id_1
         self.vertex_id_2 = vertex_id_2
+        self.condition: Optional[str] = condition
 
 
 class CFG:
@@ -253,10 +594,16 @@ class CFG:
             self.add_vertex(Vertex(id_, np.array((x, y))))
 
     def add_edges(self, array: list):
-        for id_1, id_2 in array:
-            self.edges.append(Edge(id_1, id_2))
-            self.repr.add(Arrow(self.vertices[id_1].point,
-                self.vertices[id_2].point))
+        """
+        Add edges given as `(id_1, id_2)` or `(id_1, id_2, condition)`.
+        """
+        for id_1, id_2, *condition in array:
+            self.edges.append(Edge(id_1, id_2, *condition))
+            if id_1 == id_2:
+                self.repr.add(Loop(self.vertices[id_1].point, angle=0))
+            else:
+                self.repr.add(Arrow(self.vertices[id_1].point,
+                    self.vertices[id_2].point))
 
             self.vertices[id_1].add_child(self.vertices[id_2])
 
@@ -0,0 +1,474 @@
+"""
+Symbolic exploration of a control-flow graph with state merging.
+
+States that reach the same vertex with the same loop iteration counters are
+merged into one state with a disjunctive path condition, and every entry to a
+loop is unrolled only a bounded number of times, so that the number of states
+stays bounded for nested loops.
+"""
+import heapq
+
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from generator.cfg import CFG, Edge
+
+MERGE_NONE: str = "none"
+MERGE_LOOPS: str = "loops"
+MERGE_ALL: str = "all"
+
+
+class Condition:
+    """
+    Path condition: a conjunction of terms, where a term is either an edge
+    condition or a disjunction of conditions.
+
+    The condition is stored as a link to its prefix and the last term, so
+    states share common prefixes, and disjunction of two conditions keeps
+    their common prefix out of it: `p ∧ a ∨ p ∧ b` is stored as
+    `p ∧ (a ∨ b)`.  So the size of the condition grows with the number of
+    edges and merges rather than with the number of paths.
+    """
+    def __init__(
+            self, prefix: Optional["Condition"] = None,
+            term: Union[None, str, List["Condition"]] = None):
+        """
+        :param prefix: condition without the last term
+        :param term: edge condition or list of alternatives, `None` for
+            "true"
+        """
+        assert (prefix is None) == (term is None)
+        self.prefix: Optional[Condition] = prefix
+        self.term: Union[None, str, List[Condition]] = term
+        self.length: int = 0 if prefix is None else prefix.length + 1
+
+    def conjoin(self, literal: Optional[str]) -> "Condition":
+        """
+        Get the condition extended with the edge condition.
+
+        :param literal: edge condition, `None` means "true"
+        """
+        if literal is None:
+            return self
+        return Condition(self, literal)
+
+    def get_terms(self, prefix: Optional["Condition"] = None) -> List[
+            Union[str, List["Condition"]]]:
+        """
+        Get terms of the condition after the prefix, or all terms if the
+        prefix is not a prefix of this condition.
+        """
+        terms: List[Union[str, List[Condition]]] = []
+        condition: Condition = self
+        while condition is not prefix and condition.term is not None:
+            terms.append(condition.term)
+            condition = condition.prefix
+        return list(reversed(terms))
+
+    def join(self, other: "Condition") -> "Condition":
+        """
+        Get the disjunction of two conditions.
+        """
+        if self is other:
+            return self
+
+        # Find the longest common prefix.
+        a: Condition = self
+        b: Condition = other
+        while a.length > b.length:
+            a = a.prefix
+        while b.length > a.length:
+            b = b.prefix
+        while a is not b and a.term is not None:
+            a, b = a.prefix, b.prefix
+        # Common prefix or "true" if there is none.
+        prefix: Condition = a
+
+        alternatives: List[Condition] = []
+        for condition in self, other:
+            terms = condition.get_terms(prefix)
+            if not terms:
+                # Prefix ∧ (true ∨ x) is prefix.
+                return prefix
+            if len(terms) == 1 and isinstance(terms[0], list):
+                alternatives += terms[0]
+            else:
+                alternatives.append(Condition.from_terms(terms))
+        return Condition(prefix, alternatives)
+
+    @staticmethod
+    def from_terms(terms: List[Union[str, List["Condition"]]]) -> "Condition":
+        """
+        Create condition from the list of terms.
+        """
+        condition: Condition = Condition()
+        for term in terms:
+            condition = Condition(condition, term)
+        return condition
+
+    def size(self) -> int:
+        """
+        Get number of distinct terms stored in the condition.
+        """
+        visited: Set[int] = set()
+        stack: List[Condition] = [self]
+        while stack:
+            condition: Condition = stack.pop()
+            if id(condition) in visited or condition.term is None:
+                continue
+            visited.add(id(condition))
+            stack.append(condition.prefix)
+            if isinstance(condition.term, list):
+                stack += condition.term
+        return len(visited)
+
+    def __str__(self) -> str:
+        def to_string(condition: Condition, is_nested: bool) -> str:
+            terms = condition.get_terms()
+            if not terms:
+                return "true"
+            texts: List[str] = []
+            for term in terms:
+                if isinstance(term, str):
+                    texts.append(term)
+                    continue
+                text: str = " ∨ ".join(to_string(x, True) for x in term)
+                texts.append(
+                    f"({text})" if len(terms) > 1 or is_nested else text)
+            text = " ∧ ".join(texts)
+            return f"({text})" if is_nested and len(terms) > 1 else text
+
+        return to_string(self, False)
+
+
+class State:
+    """
+    Symbolic state: a vertex together with the condition of reaching it.
+    """
+    def __init__(
+            self, vertex_id: str, condition: Condition, paths: int = 1,
+            iterations: Optional[Dict[str, int]] = None):
+
+        self.vertex_id: str = vertex_id
+        self.condition: Condition = condition
+        # Number of execution paths represented by this state.
+        self.paths: int = paths
+        # Number of back-edge traversals for every loop head since the last
+        # entry to the loop.
+        self.iterations: Dict[str, int] = (
+            {} if iterations is None else iterations)
+
+    def get_key(self) -> Tuple[str, Tuple[Tuple[str, int], ...]]:
+        """
+        Get key of the state: only states with equal keys may be merged,
+        because their further exploration is the same.
+        """
+        return self.vertex_id, tuple(sorted(self.iterations.items()))
+
+    def merge(self, other: "State") -> None:
+        """
+        Merge other state with the same key into this one.
+        """
+        assert self.get_key() == other.get_key()
+        self.condition = self.condition.join(other.condition)
+        self.paths += other.paths
+
+
+class MergePolicy:
+    """
+    Configuration of state merging and loop summarization.
+    """
+    def __init__(self, merge_at: str = MERGE_LOOPS, unroll: int = 2):
+        """
+        :param merge_at: where to merge states: `MERGE_NONE`, `MERGE_LOOPS`
+            (only at loop heads and loop exits), or `MERGE_ALL` (at every
+            vertex)
+        :param unroll: maximum number of back-edge traversals per loop entry;
+            the counter is reset when the state leaves the loop, so an inner
+            loop is unrolled again on every iteration of the outer one
+        """
+        assert merge_at in [MERGE_NONE, MERGE_LOOPS, MERGE_ALL]
+        assert unroll >= 0
+        self.merge_at: str = merge_at
+        self.unroll: int = unroll
+
+
+class ExplorationResult:
+    """
+    Final states of the exploration and statistics.
+    """
+    def __init__(self):
+        self.states: List[State] = []
+        # Number of states that were merged into other states.
+        self.merged: int = 0
+        # Number of loop iterations cut off by the unroll bound.
+        self.truncated: int = 0
+
+    @property
+    def paths(self) -> int:
+        """
+        Number of execution paths represented by the final states.
+        """
+        return sum(x.paths for x in self.states)
+
+    @property
+    def collapsed(self) -> int:
+        """
+        Number of execution paths that do not have their own final state.
+        """
+        return self.paths - len(self.states)
+
+
+class Explorer:
+    """
+    Worklist-based symbolic execution over the control-flow graph.
+
+    States are processed in a weak topological order of their vertices: every
+    loop body goes right after its head and before any vertex outside the
+    loop.  So states leaving a loop wait at the exit until all iterations of
+    the loop are processed, and are merged there.
+    """
+    def __init__(self, cfg: CFG, policy: Optional[MergePolicy] = None):
+        self.cfg: CFG = cfg
+        self.policy: MergePolicy = policy if policy else MergePolicy()
+        self.outgoing: Dict[str, List[Edge]] = {x: [] for x in cfg.vertices}
+        for edge in cfg.edges:
+            self.outgoing[edge.vertex_id_1].append(edge)
+        self.order: Dict[str, int] = {}
+        self.back_edges: Set[Tuple[str, str]] = set()
+        # Loop head to loop body (including the head).
+        self.loops: Dict[str, Set[str]] = {}
+        # Parent in the loop nesting tree for every loop head.
+        self.outer: Dict[str, Optional[str]] = {}
+        # The innermost loop containing every reachable vertex.
+        self.innermost: Dict[str, Optional[str]] = {}
+        # Edge to heads of loops it leaves, from inner to outer.
+        self.exits: Dict[Tuple[str, str], List[str]] = {}
+        self.merge_points: Set[str] = set()
+        self.analyze()
+
+    def analyze(self) -> None:
+        """
+        Compute back edges, loops, processing order, and merge points.
+        """
+        postorder: List[str] = self.find_back_edges()
+        vertices: List[str] = list(reversed(postorder))
+
+        incoming: Dict[str, List[str]] = {x: [] for x in self.cfg.vertices}
+        for edge in self.cfg.edges:
+            incoming[edge.vertex_id_2].append(edge.vertex_id_1)
+
+        # Natural loop of a back edge: the head and all vertices reaching the
+        # latch without passing through the head.
+        for latch, head in self.back_edges:
+            body: Set[str] = self.loops.setdefault(head, {head})
+            stack: List[str] = [latch]
+            while stack:
+                id_: str = stack.pop()
+                if id_ not in body and id_ in self.innermost:
+                    body.add(id_)
+                    stack.extend(incoming[id_])
+
+        # Loop nesting tree: inner loops have smaller bodies, so they are
+        # processed later and overwrite the innermost loop of their vertices.
+        depth: Dict[Optional[str], int] = {None: 0}
+        for head in sorted(self.loops, key=lambda x: -len(self.loops[x])):
+            self.outer[head] = self.innermost[head]
+            depth[head] = depth[self.outer[head]] + 1
+            for id_ in self.loops[head]:
+                self.innermost[id_] = head
+
+        for edge in self.cfg.edges:
+            id_1, id_2 = edge.vertex_id_1, edge.vertex_id_2
+            if id_1 not in self.innermost:
+                continue
+            heads: List[str] = []
+            head: Optional[str] = self.innermost[id_1]
+            while head is not None and id_2 not in self.loops[head]:
+                heads.append(head)
+                head = self.outer[head]
+            self.exits[(id_1, id_2)] = heads
+
+        for index, id_ in enumerate(
+                self.get_weak_topological_order(vertices, depth)):
+            self.order[id_] = index
+
+        if self.policy.merge_at == MERGE_ALL:
+            self.merge_points = set(self.order.keys())
+        elif self.policy.merge_at == MERGE_LOOPS:
+            self.merge_points = set(self.loops.keys())
+            for key, heads in self.exits.items():
+                if heads:
+                    self.merge_points.add(key[1])
+
+    def find_back_edges(self) -> List[str]:
+        """
+        Find back edges with depth-first search from the initial vertex.
+
+        :return: reachable vertices in postorder
+        """
+        postorder: List[str] = []
+        if self.cfg.init_id is None:
+            return postorder
+
+        on_stack: Set[str] = {self.cfg.init_id}
+        visited: Set[str] = {self.cfg.init_id}
+        # Vertex and index of the next outgoing edge to visit.
+        stack: List[Tuple[str, int]] = [(self.cfg.init_id, 0)]
+
+        while stack:
+            id_, index = stack.pop()
+            edges: List[Edge] = self.outgoing[id_]
+            if index == len(edges):
+                on_stack.remove(id_)
+                postorder.append(id_)
+                self.innermost[id_] = None
+                continue
+            stack.append((id_, index + 1))
+            child_id: str = edges[index].vertex_id_2
+            if child_id in on_stack:
+                self.back_edges.add((id_, child_id))
+            elif child_id not in visited:
+                visited.add(child_id)
+                on_stack.add(child_id)
+                stack.append((child_id, 0))
+
+        return postorder
+
+    def get_weak_topological_order(
+            self, vertices: List[str],
+            depth: Dict[Optional[str], int]) -> List[str]:
+        """
+        Order vertices topologically with every loop body collapsed into its
+        head, and expand loop bodies recursively in the same way.
+
+        :param vertices: reachable vertices in reverse postorder, used to
+            break ties
+        :param depth: nesting depth of every loop, 0 for the top level
+        """
+        position: Dict[str, int] = {x: i for i, x in enumerate(vertices)}
+
+        # Members of every region (the top level or a loop body without
+        # inner loop bodies): vertices and heads of inner loops.
+        members: Dict[Optional[str], List[str]] = {None: []}
+        for head in self.loops:
+            members[head] = []
+        for id_ in vertices:
+            members[self.innermost[id_]].append(id_)
+            if id_ in self.loops:
+                members[self.outer[id_]].append(id_)
+
+        # Edges between members of every region.
+        edges: Dict[Optional[str], List[Tuple[str, str]]] = {
+            x: [] for x in members}
+        for edge in self.cfg.edges:
+            a: str = edge.vertex_id_1
+            b: str = edge.vertex_id_2
+            if a not in self.innermost:
+                continue
+            region_a: Optional[str] = self.innermost[a]
+            region_b: Optional[str] = self.innermost[b]
+            # Lift both ends to the common region.
+            while depth[region_a] > depth[region_b]:
+                a, region_a = region_a, self.outer[region_a]
+            while depth[region_b] > depth[region_a]:
+                b, region_b = region_b, self.outer[region_b]
+            while region_a != region_b:
+                a, region_a = region_a, self.outer[region_a]
+                b, region_b = region_b, self.outer[region_b]
+            if a != b and b != region_a:
+                edges[region_a].append((a, b))
+
+        def get_region_order(head: Optional[str]) -> List[str]:
+            """
+            Order vertices and inner loop heads directly inside the loop.
+            """
+            successors: Dict[str, Set[str]] = {x: set() for x in members[head]}
+            degree: Dict[str, int] = {x: 0 for x in members[head]}
+            for a, b in edges[head]:
+                if b not in successors[a]:
+                    successors[a].add(b)
+                    degree[b] += 1
+
+            ready: List[Tuple[int, str]] = [
+                (position[x], x) for x in members[head] if degree[x] == 0]
+            heapq.heapify(ready)
+            order: List[str] = []
+            while ready:
+                _, id_ = heapq.heappop(ready)
+                order.append(id_)
+                for child_id in successors[id_]:
+                    degree[child_id] -= 1
+                    if degree[child_id] == 0:
+                        heapq.heappush(ready, (position[child_id], child_id))
+            # Vertices of irreducible cycles keep reverse postorder.
+            order += sorted(
+                (x for x in members[head] if degree[x] > 0), key=position.get)
+            return order
+
+        result: List[str] = []
+        # Items to expand: `(head, is_expanded)`.
+        stack: List[Tuple[Optional[str], bool]] = [(None, False)]
+        while stack:
+            id_, is_expanded = stack.pop()
+            if is_expanded or (id_ is not None and id_ not in self.loops):
+                result.append(id_)
+                continue
+            region: List[str] = get_region_order(id_)
+            for item in reversed(region):
+                stack.append((item, item == id_))
+        return result
+
+    def explore(self) -> ExplorationResult:
+        """
+        Explore all paths from the initial vertex to terminal vertices.
+        """
+        result: ExplorationResult = ExplorationResult()
+        if self.cfg.init_id is None:
+            return result
+
+        # Heap of (processing order index, sequence number, state).
+        queue: List[Tuple[int, int, State]] = []
+        pending: Dict[Tuple[str, Tuple[Tuple[str, int], ...]], State] = {}
+        counter: int = 0
+
+        def push(state: State) -> None:
+            nonlocal counter
+            if state.vertex_id in self.merge_points:
+                key = state.get_key()
+                if key in pending:
+                    pending[key].merge(state)
+                    result.merged += 1
+                    return
+                pending[key] = state
+            heapq.heappush(
+                queue, (self.order[state.vertex_id], counter, state))
+            counter += 1
+
+        push(State(self.cfg.init_id, Condition()))
+
+        while queue:
+            _, _, state = heapq.heappop(queue)
+            key = state.get_key()
+            if pending.get(key) is state:
+                del pending[key]
+
+            edges: List[Edge] = self.outgoing[state.vertex_id]
+            if not edges:
+                result.states.append(state)
+                continue
+
+            for edge in edges:
+                iterations: Dict[str, int] = dict(state.iterations)
+                id_1, id_2 = edge.vertex_id_1, edge.vertex_id_2
+                for head in self.exits[(id_1, id_2)]:
+                    iterations.pop(head, None)
+                if (id_1, id_2) in self.back_edges:
+                    iterations[id_2] = iterations.get(id_2, 0) + 1
+                    if iterations[id_2] > self.policy.unroll:
+                        result.truncated += 1
+                        continue
+                push(State(
+                    id_2, state.condition.conjoin(edge.condition),
+                    state.paths, iterations))
+
+        return result
@@ -0,0 +1,123 @@
+"""
+Tests for spatial index, level of detail, and tiled rendering.
+"""
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from generator.cfg import (
+    Arrow, CFGRepresentation, GridIndex, Node, Segment)
+
+
+def test_grid_index_query() -> None:
+    index: GridIndex = GridIndex(10.0)
+    # Box crossing cell edges.
+    index.insert(0, (np.array((5, 5)), np.array((15, 15))))
+    # Box in the corner of the first cell.
+    index.insert(1, (np.array((0, 0)), np.array((2, 2))))
+    index.insert(2, None)
+
+    assert index.query(np.array((12, 12)), np.array((20, 20))) == [0, 2]
+    assert index.query(np.array((6, 6)), np.array((9, 9))) == [0, 2]
+    assert index.query(np.array((1, 1)), np.array((30, 30))) == [0, 1, 2]
+    assert index.query(np.array((16, 0)), np.array((30, 30))) == [2]
+    assert index.query(np.array((50, 50)), np.array((60, 60))) == [2]
+
+
+def test_simplify_chain() -> None:
+    representation: CFGRepresentation = CFGRepresentation()
+    representation.add_chain(
+        np.array((2, 2)), ["0", "1", "2", "3", "4"], is_terminated=True)
+
+    elements = representation.simplify().elements
+    assert [type(x) for x in elements] == [Node, Segment, Node]
+    assert not elements[0].is_labeled
+    assert elements[2].is_terminal
+    assert [list(x) for x in elements[1].points] == [[2, 2], [2, 22]]
+
+
+def test_simplify_bent_chain() -> None:
+    representation: CFGRepresentation = CFGRepresentation()
+    points: List[np.array] = [
+        np.array(x) for x in [(0, 0), (5, 0), (10, 0), (10, 5), (10, 10)]]
+    for point in points:
+        representation.add(Node(point, is_terminal=point is points[-1]))
+    for point_1, point_2 in zip(points, points[1:]):
+        representation.add(Arrow(point_1, point_2))
+
+    elements = representation.simplify().elements
+    segments: List[Segment] = [x for x in elements if isinstance(x, Segment)]
+    assert len(segments) == 1
+    assert [list(x) for x in segments[0].points] == [
+        [0, 0], [10, 0], [10, 10]]
+    assert len([x for x in elements if isinstance(x, Node)]) == 2
+
+
+def test_simplify_keeps_branches() -> None:
+    representation: CFGRepresentation = CFGRepresentation()
+    a, b, c = np.array((0, 0)), np.array((-4, 4)), np.array((4, 4))
+    for point in a, b, c:
+        representation.add(Node(point))
+    representation.add(Arrow(a, b))
+    representation.add(Arrow(a, c))
+
+    elements = representation.simplify().elements
+    assert [type(x) for x in elements] == [Node, Node, Node, Arrow, Arrow]
+
+
+def test_bounds_padding() -> None:
+    arrow: Arrow = Arrow(np.array((10, 2)), np.array((10, 6)))
+    min_, max_ = arrow.bounds()
+    # Arrowhead sticks out of the line to both sides.
+    assert min_[0] <= 52.5 - 3.0 and max_[0] >= 52.5 + 3.0
+
+    node: Node = Node(np.array((0, 0)), index="1234567890")
+    min_, max_ = node.bounds()
+    assert max_[0] - min_[0] > 2 * node.radius
+    node = Node(np.array((0, 0)), index="1234567890", is_labeled=False)
+    min_, max_ = node.bounds()
+    assert max_[0] - min_[0] == 2 * node.radius
+
+
+def test_draw_tiles(tmp_path: Path) -> None:
+    representation: CFGRepresentation = CFGRepresentation()
+    a, b = np.array((2, 2)), np.array((15, 2))
+    representation.add(Node(a))
+    representation.add(Node(b))
+    representation.add(Arrow(a, b))
+    # Arrow just right of the edge between tiles.
+    representation.add(Arrow(np.array((10, 4)), np.array((10, 8))))
+
+    file_names: List[str] = representation.draw_tiles(
+        str(tmp_path), np.array((100, 100)), tile_size=50.0, levels=2)
+
+    assert sorted(Path(x).relative_to(tmp_path).as_posix()
+        for x in file_names) == ["0/0_0.svg", "1/0_0.svg", "1/1_0.svg"]
+    assert not (tmp_path / "1" / "0_1.svg").exists()
+
+    left: str = (tmp_path / "1" / "0_0.svg").read_text()
+    right: str = (tmp_path / "1" / "1_0.svg").read_text()
+    # Arrow crossing the edge and arrowheads near the edge are in both tiles.
+    assert left.count("<line") == 2
+    assert right.count("<line") == 2
+
+
+def test_draw_tiles_level_of_detail(tmp_path: Path) -> None:
+    representation: CFGRepresentation = CFGRepresentation()
+    representation.add_chain(
+        np.array((2, 2)), [str(x) for x in range(10)], is_terminated=True)
+
+    representation.draw_tiles(
+        str(tmp_path), np.array((100, 100)), tile_size=50.0, levels=2,
+        detail_scale=1.0, min_node_size=10.0)
+
+    # Level 0 has scale 0.5: simplified and aggregated.
+    coarse: str = (tmp_path / "0" / "0_0.svg").read_text()
+    assert "<rect" in coarse
+    assert "<circle" not in coarse and "<text" not in coarse
+
+    # Level 1 has scale 1.0: detailed.
+    detailed: str = (tmp_path / "1" / "0_0.svg").read_text()
+    assert "<text" in detailed
+    assert "<rect" not in detailed
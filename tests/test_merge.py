@@ -0,0 +1,132 @@
+"""
+Tests for state merging over control-flow graphs.
+"""
+from typing import List, Tuple
+
+from generator.cfg import CFG
+from generator.merge import (
+    ExplorationResult, Explorer, MergePolicy, MERGE_ALL, MERGE_LOOPS,
+    MERGE_NONE)
+
+
+def build(edges: List[Tuple[str, ...]]) -> CFG:
+    """
+    Create control-flow graph with vertices in the order of appearance.
+    """
+    cfg: CFG = CFG()
+    ids: List[str] = []
+    for edge in edges:
+        for id_ in edge[:2]:
+            if id_ not in ids:
+                ids.append(id_)
+    cfg.add_vertices([(id_, 0, index * 5) for index, id_ in enumerate(ids)])
+    cfg.add_edges(edges)
+    return cfg
+
+
+def explore(cfg: CFG, merge_at: str, unroll: int = 2) -> ExplorationResult:
+    return Explorer(cfg, MergePolicy(merge_at, unroll)).explore()
+
+
+def check_merging(cfg: CFG, unroll: int = 2) -> None:
+    """
+    Check that merging keeps explored paths and reduces final states.
+    """
+    unmerged: ExplorationResult = explore(cfg, MERGE_NONE, unroll)
+    assert unmerged.collapsed == 0
+
+    for merge_at in MERGE_LOOPS, MERGE_ALL:
+        merged: ExplorationResult = explore(cfg, merge_at, unroll)
+        assert merged.paths == unmerged.paths
+        assert len(merged.states) < len(unmerged.states)
+        assert merged.collapsed == merged.paths - len(merged.states)
+
+
+def test_cycle() -> None:
+    """
+    Cycle program from the paper: 0 → 1, 0 → 0 → 1, 0 → 0 → 0 → 1.
+    """
+    cfg: CFG = build([("0", "0", "a"), ("0", "1", "¬a")])
+    result: ExplorationResult = explore(cfg, MERGE_NONE)
+    assert result.paths == 3
+    check_merging(cfg)
+
+    result = explore(cfg, MERGE_LOOPS)
+    assert len(result.states) == 1
+    assert str(result.states[0].condition) == "¬a ∨ (a ∧ ¬a) ∨ (a ∧ a ∧ ¬a)"
+
+
+def test_top_tested_nested_loops() -> None:
+    cfg: CFG = build([
+        ("0", "1"), ("1", "2", "a"), ("1", "5", "¬a"), ("2", "3", "b"),
+        ("2", "4", "¬b"), ("3", "2"), ("4", "1")])
+    check_merging(cfg)
+    assert len(explore(cfg, MERGE_LOOPS).states) == 1
+
+
+def test_bottom_tested_nested_loops() -> None:
+    cfg: CFG = build([
+        ("0", "1"), ("1", "2"), ("2", "3"), ("3", "3", "c"),
+        ("3", "4", "¬c"), ("4", "2", "b"), ("4", "5", "¬b"),
+        ("5", "1", "a"), ("5", "6", "¬a"), ("6", "7")])
+    check_merging(cfg, unroll=1)
+    assert len(explore(cfg, MERGE_LOOPS, unroll=1).states) == 1
+
+
+def test_unroll_per_entry() -> None:
+    """
+    Inner loop is unrolled again on every iteration of the outer loop.
+    """
+    cfg: CFG = build([
+        ("0", "1"), ("1", "2", "a"), ("1", "4", "¬a"), ("2", "2", "b"),
+        ("2", "3", "¬b"), ("3", "1")])
+    # Outer loop makes 0, 1, or 2 iterations, inner loop makes 0, 1, or 2
+    # iterations for every outer one.
+    assert explore(cfg, MERGE_NONE).paths == 1 + 3 + 3 * 3
+
+
+def test_parallel_edges() -> None:
+    cfg: CFG = build([("0", "1", "a"), ("0", "1", "¬a")])
+    result: ExplorationResult = explore(cfg, MERGE_ALL)
+    assert result.paths == 2
+    assert str(result.states[0].condition) == "a ∨ ¬a"
+
+
+def test_long_chain() -> None:
+    cfg: CFG = build([(str(i), str(i + 1)) for i in range(3000)])
+    assert explore(cfg, MERGE_LOOPS).paths == 1
+
+
+def test_condition_size_on_diamonds() -> None:
+    """
+    Merged condition of sequential branches factors out common prefixes.
+    """
+    count: int = 30
+    edges: List[Tuple[str, ...]] = []
+    for i in range(count):
+        edges += [
+            (f"{i}", f"{i}a", f"a{i}"), (f"{i}", f"{i}b", f"¬a{i}"),
+            (f"{i}a", f"{i + 1}"), (f"{i}b", f"{i + 1}")]
+    result: ExplorationResult = explore(build(edges), MERGE_ALL)
+    assert result.paths == 2 ** count
+    assert len(result.states) == 1
+    assert result.states[0].condition.size() <= 3 * count
+    assert str(result.states[0].condition).startswith(
+        "(¬a0 ∨ a0) ∧ (¬a1 ∨ a1) ∧ ")
+
+
+def test_condition_size_on_sequential_loops() -> None:
+    count: int = 200
+    edges: List[Tuple[str, ...]] = []
+    for i in range(count):
+        edges += [(f"{i}", f"{i}", f"a{i}"), (f"{i}", f"{i + 1}", f"¬a{i}")]
+    result: ExplorationResult = explore(build(edges), MERGE_LOOPS)
+    assert result.paths == 3 ** count
+    assert len(result.states) == 1
+    assert result.states[0].condition.size() <= 10 * count
+
+
+def test_empty() -> None:
+    result: ExplorationResult = explore(CFG(), MERGE_LOOPS)
+    assert result.states == []
+    assert result.paths == 0